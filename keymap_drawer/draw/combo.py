@@ -1,11 +1,11 @@
 """Module containing class and methods to draw combo representations."""
 
-from io import StringIO
-from math import copysign
+from heapq import nsmallest
+from math import hypot
 from typing import Sequence
 
 from keymap_drawer.config import DrawConfig
-from keymap_drawer.draw.utils import UtilsMixin
+from keymap_drawer.draw.utils import UtilsMixin, fmt_num, to_class_str
 from keymap_drawer.keymap import ComboSpec, LayoutKey
 from keymap_drawer.physical_layout import PhysicalKey, PhysicalLayout, Point
 
@@ -15,38 +15,39 @@ class ComboDrawerMixin(UtilsMixin):
 
     # initialized in KeymapDrawer
     cfg: DrawConfig
-    out: StringIO
+    _buf: list[str]
+    _arc_prefix: str
     layout: PhysicalLayout
 
     def _draw_arc_dendron(self, p_1: Point, p_2: Point, x_first: bool, shorten: float, arc_scale: float) -> None:
-        diff = p_2 - p_1
+        dx, dy = p_2.x - p_1.x, p_2.y - p_1.y
 
         # check if the points are too close to draw an arc, if so draw a line instead
-        if (x_first and abs(diff.x) < self.cfg.arc_radius) or (not x_first and abs(diff.y) < self.cfg.arc_radius):
+        if abs(dx if x_first else dy) < self.cfg.arc_radius:
             self._draw_line_dendron(p_1, p_2, shorten)
             return
 
-        start = f"M{round(p_1.x)},{round(p_1.y)}"
-        arc_x = copysign(self.cfg.arc_radius, diff.x)
-        arc_y = copysign(self.cfg.arc_radius, diff.y)
-        clockwise = (diff.x > 0) ^ (diff.y > 0)
+        sx = 1.0 if dx >= 0 else -1.0
+        sy = 1.0 if dy >= 0 else -1.0
+        arc_x, arc_y = sx * self.cfg.arc_radius, sy * self.cfg.arc_radius
+        clockwise = (dx > 0) ^ (dy > 0) ^ x_first
         if x_first:
-            line_1 = f"h{round(arc_scale * diff.x - arc_x)}"
-            line_2 = f"v{round(diff.y - arc_y - copysign(shorten, diff.y))}"
-            clockwise = not clockwise
+            line_1 = f"h{round(arc_scale * dx - arc_x)}"
+            line_2 = f"v{round(dy - arc_y - sy * shorten)}"
         else:
-            line_1 = f"v{round(arc_scale * diff.y - arc_y)}"
-            line_2 = f"h{round(diff.x - arc_x - copysign(shorten, diff.x))}"
-        arc = f"a{self.cfg.arc_radius},{self.cfg.arc_radius} 0 0 {int(clockwise)} {arc_x},{arc_y}"
-        self.out.write(f'<path d="{start} {line_1} {arc} {line_2}" class="combo"/>\n')
+            line_1 = f"v{round(arc_scale * dy - arc_y)}"
+            line_2 = f"h{round(dx - arc_x - sx * shorten)}"
+        self._buf.append(
+            f'<path d="M{round(p_1.x)},{round(p_1.y)} {line_1} '
+            f'{self._arc_prefix}{int(clockwise)} {fmt_num(arc_x)},{fmt_num(arc_y)} {line_2}" class="combo"/>\n'
+        )
 
     def _draw_line_dendron(self, p_1: Point, p_2: Point, shorten: float) -> None:
-        start = f"M{round(p_1.x)},{round(p_1.y)}"
-        diff = p_2 - p_1
-        if shorten and shorten < (magn := abs(diff)):
-            diff = (1 - shorten / magn) * diff
-        line = f"l{round(diff.x)},{round(diff.y)}"
-        self.out.write(f'<path d="{start} {line}" class="combo"/>\n')
+        dx, dy = p_2.x - p_1.x, p_2.y - p_1.y
+        if shorten and shorten < (magn := hypot(dx, dy)):
+            scale = 1 - shorten / magn
+            dx, dy = scale * dx, scale * dy
+        self._buf.append(f'<path d="M{round(p_1.x)},{round(p_1.y)} l{round(dx)},{round(dy)}" class="combo"/>\n')
 
     def print_combo(self, combo: ComboSpec, combo_ind: int) -> tuple[Point, Point]:  # pylint: disable=too-many-locals
         """
@@ -60,46 +61,57 @@ class ComboDrawerMixin(UtilsMixin):
         width, height = combo.width or self.cfg.combo_w, combo.height or self.cfg.combo_h
 
         # find center of combo box
-        p_mid = (1 / len(p_keys)) * sum((k.pos for k in p_keys), start=Point(0, 0))
+        sum_x = sum_y = 0.0
+        for k in p_keys:
+            sum_x += k.pos.x
+            sum_y += k.pos.y
+        mid_x, mid_y = sum_x / len(p_keys), sum_y / len(p_keys)
         if combo.slide is not None:  # find two keys furthest from the midpoint, interpolate between their positions
-            sorted_keys = sorted(p_keys, key=lambda k: (-abs(k.pos - p_mid), k.pos.x, k.pos.y))
-            start, end = sorted_keys[0:2]
-            p_mid = (1 - combo.slide) / 2 * start.pos + (1 + combo.slide) / 2 * end.pos
+            start, end = (
+                k.pos
+                for k in nsmallest(
+                    2, p_keys, key=lambda k: (-((k.pos.x - mid_x) ** 2 + (k.pos.y - mid_y) ** 2), k.pos.x, k.pos.y)
+                )
+            )
+            w_start, w_end = (1 - combo.slide) / 2, (1 + combo.slide) / 2
+            mid_x, mid_y = w_start * start.x + w_end * end.x, w_start * start.y + w_end * end.y
+        p_mid = Point(mid_x, mid_y)
 
+        key_bounds = self.layout.key_bounds
         match combo.align:
             case "mid":
                 p = p_mid
             case "top":
                 p = Point(
                     p_mid.x,
-                    min(k.pos.y - k.height / 2 for k in p_keys)
+                    min(key_bounds[i][1] for i in combo.key_positions)
                     - self.cfg.inner_pad_h / 2
                     - combo.offset * self.layout.min_height,
                 )
             case "bottom":
                 p = Point(
                     p_mid.x,
-                    max(k.pos.y + k.height / 2 for k in p_keys)
+                    max(key_bounds[i][3] for i in combo.key_positions)
                     + self.cfg.inner_pad_h / 2
                     + combo.offset * self.layout.min_height,
                 )
             case "left":
                 p = Point(
-                    min(k.pos.x - k.width / 2 for k in p_keys)
+                    min(key_bounds[i][0] for i in combo.key_positions)
                     - self.cfg.inner_pad_w / 2
                     - combo.offset * self.layout.min_width,
                     p_mid.y,
                 )
             case "right":
                 p = Point(
-                    max(k.pos.x + k.width / 2 for k in p_keys)
+                    max(key_bounds[i][2] for i in combo.key_positions)
                     + self.cfg.inner_pad_w / 2
                     + combo.offset * self.layout.min_width,
                     p_mid.y,
                 )
 
-        class_str = self._to_class_str(["combo", combo.type, combo.key.type, f"combopos-{combo_ind}"])
-        self.out.write(f"<g{class_str}>\n")
+        class_str = to_class_str(("combo", combo.type, combo.key.type, f"combopos-{combo_ind}"))
+        self._buf.append(f"<g{class_str}>\n")
 
         # draw dendrons going from box to combo keys
         if combo.dendron is not False:
@@ -108,7 +120,7 @@ class ComboDrawerMixin(UtilsMixin):
                     for k in p_keys:
                         offset = (
                             k.height / 5
-                            if abs((k.pos - p).x) < width / 2 and abs((k.pos - p).y) <= k.height / 3 + height / 2
+                            if abs(k.pos.x - p.x) < width / 2 and abs(k.pos.y - p.y) <= k.height / 3 + height / 2
                             else k.height / 3
                         )
                         self._draw_arc_dendron(p, k.pos, True, offset, combo.arc_scale)
@@ -116,62 +128,41 @@ class ComboDrawerMixin(UtilsMixin):
                     for k in p_keys:
                         offset = (
                             k.width / 5
-                            if abs((k.pos - p).y) < height / 2 and abs((k.pos - p).x) <= k.width / 3 + width / 2
+                            if abs(k.pos.y - p.y) < height / 2 and abs(k.pos.x - p.x) <= k.width / 3 + width / 2
                             else k.width / 3
                         )
                         self._draw_arc_dendron(p, k.pos, False, offset, combo.arc_scale)
                 case "mid":
                     for k in p_keys:
-                        if combo.dendron is True or abs(k.pos - p) >= k.width - 1:
+                        if combo.dendron is True or hypot(k.pos.x - p.x, k.pos.y - p.y) >= k.width - 1:
                             self._draw_line_dendron(p, k.pos, k.width / 3)
 
         # draw combo box with text
-        if combo.rotation != 0.0:
-            self.out.write(f'<g transform="rotate({combo.rotation}, {p.x}, {p.y})">\n')
+        r = combo.rotation
+        if rotated := r != 0.0:
+            self._buf.append(f'<g transform="rotate({fmt_num(r)}, {fmt_num(p.x)}, {fmt_num(p.y)})">\n')
         self._draw_rect(
             p,
             Point(width, height),
-            Point(self.cfg.key_rx, self.cfg.key_ry),
-            classes=["combo", combo.type, combo.key.type],
+            self._key_rect_prefix,
+            classes=("combo", combo.type, combo.key.type),
         )
 
-        self._draw_legend(
+        self._draw_legends(
+            p,
             p,
+            Point(self.cfg.combo_w / 2 - self.cfg.small_pad, self.cfg.combo_h / 2 - self.cfg.small_pad),
+            combo.key,
             self._split_text(combo.key.tap, truncate=2, line_width=self.cfg.shrink_wide_legends),
-            classes=["combo", combo.type, combo.key.type],
-            legend_type="tap",
-        )
-        self._draw_legend(
-            p + Point(0, self.cfg.combo_h / 2 - self.cfg.small_pad),
-            [combo.key.hold],
-            classes=["combo", combo.type, combo.key.type],
-            legend_type="hold",
-        )
-        self._draw_legend(
-            p - Point(0, self.cfg.combo_h / 2 - self.cfg.small_pad),
-            [combo.key.shifted],
-            classes=["combo", combo.type, combo.key.type],
-            legend_type="shifted",
+            classes=("combo", combo.type, combo.key.type),
         )
-        self._draw_legend(
-            p - Point(self.cfg.combo_w / 2 - self.cfg.small_pad, 0),
-            [combo.key.left],
-            classes=["combo", combo.type, combo.key.type],
-            legend_type="left",
-        )
-        self._draw_legend(
-            p + Point(self.cfg.combo_w / 2 - self.cfg.small_pad, 0),
-            [combo.key.right],
-            classes=["combo", combo.type, combo.key.type],
-            legend_type="right",
-        )
-        if combo.rotation != 0.0:
-            self.out.write("</g>\n")
+        if rotated:
+            self._buf.append("</g>\n")
 
-        self.out.write("</g>\n")
+        self._buf.append("</g>\n")
 
         # calculate bounding box coordinates by creating a temporary PhysicalKey
-        combo_key = PhysicalKey(p, width, height, combo.rotation)
+        combo_key = PhysicalKey(p, width, height, r)
         dims = 0.5 * Point(combo_key.bounding_width, combo_key.bounding_height)
         return p - dims, p + dims
 
@@ -180,8 +171,17 @@ class ComboDrawerMixin(UtilsMixin):
         Print SVG for all given combos, relative to that point.
         Return min and max y-coordinates of combo boxes, for bounding box calculations.
         """
-        combo_pts = [self.print_combo(combo, ind) for ind, combo in enumerate(combos) if not combo.hidden]
-        return min((p.y for p, _ in combo_pts), default=None), max((p.y for _, p in combo_pts), default=None)
+        min_y: float | None = None
+        max_y: float | None = None
+        for ind, combo in enumerate(combos):
+            if combo.hidden:
+                continue
+            top_left, bottom_right = self.print_combo(combo, ind)
+            if min_y is None or top_left.y < min_y:
+                min_y = top_left.y
+            if max_y is None or bottom_right.y > max_y:
+                max_y = bottom_right.y
+        return min_y, max_y
 
     def create_combo_diagrams(
         self, scale_factor: int, ghost_keys: Sequence[int] | None = None
@@ -212,8 +212,8 @@ class ComboDrawerMixin(UtilsMixin):
             for key_position in combo.key_positions:
                 empty_layer[key_position].type = "held"
 
-            header_l_key = combo.key
-            header_l_key.type = " ".join([header_l_key.type, "combo-separate"])
-            layers[f"combopos-{ind}"] = [combo.key] + empty_layer
+            # copy the combo key so that the keymap data is not modified, in case the drawer is reused
+            header_l_key = combo.key.model_copy(update={"type": " ".join([combo.key.type, "combo-separate"])})
+            layers[f"combopos-{ind}"] = [header_l_key] + empty_layer
 
         return layout, layers
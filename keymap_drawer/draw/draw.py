@@ -5,42 +5,66 @@ representation of the keymap using these two.
 """
 
 from copy import deepcopy
-from html import escape
-from io import StringIO
-from typing import Mapping, Sequence, TextIO
+from typing import Any, Mapping, Sequence, TextIO
 
 from keymap_drawer.config import Config
 from keymap_drawer.draw.combo import ComboDrawerMixin
-from keymap_drawer.draw.utils import UtilsMixin
+from keymap_drawer.draw.utils import UtilsMixin, escape, fmt_num, to_class_str
 from keymap_drawer.keymap import ComboSpec, KeymapData, LayoutKey
 from keymap_drawer.physical_layout import PhysicalKey, PhysicalLayout, Point
 
 
-class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
+class KeymapDrawer(ComboDrawerMixin, UtilsMixin):  # pylint: disable=too-many-instance-attributes
     """Class that draws a keyboard representation in SVG."""
 
-    def __init__(self, config: Config, out: TextIO, **kwargs) -> None:
+    def __init__(self, config: Config, out: TextIO | None = None, **kwargs: Any) -> None:
         self.cfg = config.draw_config
+        self._load_keymap(config, **kwargs)
+        self.out = out
+        self._buf: list[str] = []
+
+        # constant SVG fragments derived from the draw config, to avoid re-formatting them for every element
+        self._key_rect_prefix = f'<rect rx="{round(self.cfg.key_rx)}" ry="{round(self.cfg.key_ry)}"'
+        self._key_side_rect_prefix = (
+            f'<rect rx="{round(self.cfg.key_side_pars.rx)}" ry="{round(self.cfg.key_side_pars.ry)}"'
+        )
+        self._arc_prefix = f"a{fmt_num(self.cfg.arc_radius)},{fmt_num(self.cfg.arc_radius)} 0 0 "
+        self._line_spacing_em = f"{fmt_num(self.cfg.line_spacing)}em"
+
+    def _load_keymap(self, config: Config, **kwargs: Any) -> None:
         self.keymap = KeymapData(config=config, **kwargs)
         self.init_glyphs()
         assert self.keymap.layout is not None, "A PhysicalLayout must be provided for drawing"
         assert self.keymap.config is not None, "A Config must be provided for drawing"
         self.layout = self.keymap.layout
         self.layer_names = set()
-        self.output_stream = out
-        self.out = StringIO()
+
+    def reset(self, out: TextIO | None = None, **kwargs: Any) -> None:
+        """
+        Prepare the drawer to be reused, e.g. to draw many keymaps with the same config. If `out` is given, it
+        replaces the current output stream. Keyword arguments replace the corresponding keymap data fields like in
+        the constructor, keeping the current `layers`, `combos` and `layout` unless overridden, e.g.
+        `drawer.reset(layers=new_layers)` or `drawer.reset(out, layers=..., combos=..., layout=...)`.
+        """
+        if out is not None:
+            self.out = out
+        self._buf.clear()
+        if kwargs:
+            assert self.keymap.config is not None
+            current = {"layers": self.keymap.layers, "combos": self.keymap.combos, "layout": self.keymap.layout}
+            self._load_keymap(self.keymap.config, **(current | kwargs))
 
     def print_layer_header(self, p: Point, header: str) -> None:
         """Print a layer header that precedes the layer visualization."""
         text = header + ":" if self.cfg.append_colon_to_layer_header else header
-        self.out.write(
+        self._buf.append(
             f'<text x="{round(p.x)}" y="{round(p.y)}" class="label" id="{self._str_to_id(header)}">{escape(text)}</text>\n'
         )
 
     def print_footer(self, p: Point) -> None:
         """Print a footer with text given by cfg.footer_text, with CSS class `footer` for bottom-right alignment."""
-        self.output_stream.write(
-            f'<text x="{p.x - self.cfg.outer_pad_w}" y="{p.y - self.cfg.outer_pad_h / 2}" class="footer">'
+        self._buf.append(
+            f'<text x="{fmt_num(p.x - self.cfg.outer_pad_w)}" y="{fmt_num(p.y - self.cfg.outer_pad_h / 2)}" class="footer">'
             f"{self.cfg.footer_text}</text>"
         )
 
@@ -55,22 +79,22 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
             p_key.height,
             p_key.rotation,
         )
-        rotate_str = f" rotate({r})" if r != 0 else ""
+        rotate_str = f" rotate({fmt_num(r)})" if r != 0 else ""
         transform_attr = f' transform="translate({round(p.x)}, {round(p.y)}){rotate_str}"'
-        class_str = self._to_class_str(["key", l_key.type, f"keypos-{key_ind}"])
-        self.out.write(f"<g{transform_attr}{class_str}>\n")
+        class_str = to_class_str(("key", l_key.type, f"keypos-{key_ind}"))
+        self._buf.append(f"<g{transform_attr}{class_str}>\n")
 
-        self._draw_key(Point(w - 2 * self.cfg.inner_pad_w, h - 2 * self.cfg.inner_pad_h), classes=["key", l_key.type])
+        self._draw_key(Point(w - 2 * self.cfg.inner_pad_w, h - 2 * self.cfg.inner_pad_h), classes=("key", l_key.type))
         if p_key.is_iso_enter:
-            self.out.write(
+            self._buf.append(
                 f'<g transform="translate({round(-w / 10)}, {round(-h / 4)})" '
                 'style="clip-path: polygon(-5% -5%, 58.34% -5%, 16.67% 105%, 0% 105%)">\n'
             )
             self._draw_key(
                 Point(w * 6 / 5 - 2 * self.cfg.inner_pad_w, h / 2 - 2 * self.cfg.inner_pad_h),
-                classes=["key", l_key.type],
+                classes=("key", l_key.type),
             )
-            self.out.write("</g>\n")
+            self._buf.append("</g>\n")
 
         tap_words = self._split_text(l_key.tap, truncate=3, line_width=self.cfg.shrink_wide_legends)
 
@@ -87,39 +111,17 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
         if self.cfg.draw_key_sides:
             tap_shift -= Point(self.cfg.key_side_pars.rel_x, self.cfg.key_side_pars.rel_y)
 
-        self._draw_legend(
+        self._draw_legends(
             tap_shift,
+            Point(0, 0),
+            Point(w / 2 - self.cfg.inner_pad_w - self.cfg.small_pad, h / 2 - self.cfg.inner_pad_h - self.cfg.small_pad),
+            l_key,
             tap_words,
-            classes=["key", l_key.type],
-            legend_type="tap",
+            classes=("key", l_key.type),
             shift=shift,
         )
-        self._draw_legend(
-            Point(0, h / 2 - self.cfg.inner_pad_h - self.cfg.small_pad),
-            [l_key.hold],
-            classes=["key", l_key.type],
-            legend_type="hold",
-        )
-        self._draw_legend(
-            Point(0, -h / 2 + self.cfg.inner_pad_h + self.cfg.small_pad),
-            [l_key.shifted],
-            classes=["key", l_key.type],
-            legend_type="shifted",
-        )
-        self._draw_legend(
-            Point(-w / 2 + self.cfg.inner_pad_w + self.cfg.small_pad, 0),
-            [l_key.left],
-            classes=["key", l_key.type],
-            legend_type="left",
-        )
-        self._draw_legend(
-            Point(w / 2 - self.cfg.inner_pad_w - self.cfg.small_pad, 0),
-            [l_key.right],
-            classes=["key", l_key.type],
-            legend_type="right",
-        )
 
-        self.out.write("</g>\n")
+        self._buf.append("</g>\n")
 
     def print_layers(  # pylint: disable=too-many-locals
         self,
@@ -144,7 +146,7 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
             outer_pad_h = self.cfg.outer_pad_h // pad_divisor if ind > n_cols - 1 else self.cfg.outer_pad_h
 
             # per-layer class group
-            self.out.write(
+            self._buf.append(
                 f'<g transform="translate({round(p.x + outer_pad_w)}, {round(p.y)})" class="layer-{escape(name)}">\n'
             )
 
@@ -152,26 +154,23 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
             if draw_header:
                 self.print_layer_header(Point(0, outer_pad_h / 2), name)
 
-            # back up main buffer, create and start writing to a temp output buffer
-            with StringIO() as temp_buffer:
-                writer = self.out
-                self.out = temp_buffer
+            # reserve a slot for the shifting group, to be filled once we know the top y coordinate
+            shift_ind = len(self._buf)
+            self._buf.append("")
 
-                # draw keys to temp buffer
-                for key_ind, (p_key, l_key) in enumerate(zip(layout.keys, layer_keys)):
-                    self.print_key(p_key, l_key, key_ind)
+            # draw keys
+            for key_ind, (p_key, l_key) in enumerate(zip(layout.keys, layer_keys)):
+                self.print_key(p_key, l_key, key_ind)
 
-                # draw combos to temp buffer and calculate top/bottom y coordinates
-                min_y, max_y = self.print_combos_for_layer(combos_per_layer.get(name, []))
-                top_y = 0.0 if min_y is None else min(0.0, min_y)
-                bottom_y = layout.height if max_y is None else max(layout.height, max_y)
+            # draw combos and calculate top/bottom y coordinates
+            min_y, max_y = self.print_combos_for_layer(combos_per_layer.get(name, []))
+            top_y = 0.0 if min_y is None else min(0.0, min_y)
+            bottom_y = layout.height if max_y is None else max(layout.height, max_y)
 
-                # shift by the top y coordinate, then dump the temp buffer
-                writer.write(f'<g transform="translate(0, {round(outer_pad_h - top_y)})">\n')
-                writer.write(temp_buffer.getvalue())
-                writer.write("</g>\n")
-                writer.write("</g>\n")
-            self.out = writer
+            # shift by the top y coordinate
+            self._buf[shift_ind] = f'<g transform="translate(0, {round(outer_pad_h - top_y)})">\n'
+            self._buf.append("</g>\n")
+            self._buf.append("</g>\n")
 
             max_height = max(max_height, bottom_y - top_y)
 
@@ -183,14 +182,33 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
 
         return Point(original_x + col_width * n_cols, p.y)
 
-    def print_board(  # pylint: disable=too-many-locals
+    def print_board(
         self,
         draw_layers: Sequence[str] | None = None,
         keys_only: bool = False,
         combos_only: bool = False,
         ghost_keys: Sequence[int] | None = None,
     ) -> None:
-        """Print SVG code representing the keymap."""
+        """Print SVG code representing the keymap to the output stream, see `render` for the arguments."""
+        assert self.out is not None, "An output stream must be provided to print the board, or use `render`"
+
+        # write everything to the output stream at once, then flush so that the full board is available to readers
+        # of the stream (e.g. a pipe) even if the caller keeps it open to draw more boards
+        self.out.write(self.render(draw_layers, keys_only, combos_only, ghost_keys))
+        self.out.flush()
+
+    def render(  # pylint: disable=too-many-locals
+        self,
+        draw_layers: Sequence[str] | None = None,
+        keys_only: bool = False,
+        combos_only: bool = False,
+        ghost_keys: Sequence[int] | None = None,
+    ) -> str:
+        """
+        Return SVG code representing the keymap as a string, without going through the output stream.
+        Optionally only draw layers `draw_layers`, only keys or combos, and draw keys at `ghost_keys` as ghosts.
+        """
+        self._buf.clear()
         layers = deepcopy(self.keymap.layers)
         if draw_layers:
             assert all(l in layers for l in draw_layers), "Some layer names selected for drawing are not in the keymap"
@@ -218,7 +236,7 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
 
         self.layer_names = set(layers)
 
-        # write to internal output stream self.out
+        # draw layers into the internal buffer self._buf
         p = self.print_layers(Point(0, 0), self.layout, layers, combos_per_layer, self.cfg.n_columns)
 
         if not keys_only:
@@ -235,13 +253,7 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
                     pad_divisor=self.cfg.combo_diagrams_scale,
                 )
 
-        # write to final output stream self.output_stream
         board_w, board_h = round(p.x), round(p.y + self.cfg.outer_pad_h)
-        self.output_stream.write(
-            f'<svg width="{board_w}" height="{board_h}" viewBox="0 0 {board_w} {board_h}" class="keymap" '
-            'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">\n'
-        )
-        self.output_stream.write(self.get_glyph_defs())
 
         dark_style = ""
         if self.cfg.dark_mode == "auto" and self.cfg.svg_style_dark:
@@ -250,10 +262,17 @@ class KeymapDrawer(ComboDrawerMixin, UtilsMixin):
             dark_style = f"\n{self.cfg.svg_style_dark}"
         extra_style = f"\n{self.cfg.svg_extra_style}" if self.cfg.svg_extra_style else ""
 
-        self.output_stream.write(f"<style>{self.cfg.svg_style}{dark_style}{extra_style}</style>\n")
-        self.output_stream.write(self.out.getvalue())
+        # prepend the SVG header, glyph definitions and style now that the board dimensions are known
+        self._buf[:0] = [
+            f'<svg width="{board_w}" height="{board_h}" viewBox="0 0 {board_w} {board_h}" class="keymap" '
+            'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">\n',
+            self.get_glyph_defs(),
+            f"<style>{self.cfg.svg_style}{dark_style}{extra_style}</style>\n",
+        ]
 
         if self.cfg.footer_text:
             self.print_footer(Point(board_w, board_h))
 
-        self.output_stream.write("</svg>\n")
+        self._buf.append("</svg>\n")
+
+        return "".join(self._buf)
@@ -7,6 +7,7 @@ import logging
 import re
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache, partial
+from math import isfinite
 from pathlib import Path
 from random import random
 from time import sleep
@@ -25,17 +26,14 @@ FETCH_WORKERS = 8
 FETCH_TIMEOUT = 10
 N_RETRY = 5
 CACHE_GLYPHS_PATH = Path(user_cache_dir("keymap-drawer", False)) / "glyphs"
+SCRUB_DIMS_RE = re.compile(r' (width|height)=".*?"')
+VIEW_BOX_VALUES_RE = re.compile(r'(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)"', re.ASCII)
 
 
 class GlyphMixin:
     """Mixin that handles SVG glyphs for KeymapDrawer."""
 
     _glyph_name_re = re.compile(r"\$\$(?P<glyph>.*)\$\$")
-    _view_box_dimensions_re = re.compile(
-        r'<svg.*viewbox="(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)".*>',
-        flags=re.IGNORECASE | re.ASCII | re.DOTALL,
-    )
-    _scrub_dims_re = re.compile(r' (width|height)=".*?"')
 
     # initialized in KeymapDrawer
     cfg: DrawConfig
@@ -72,9 +70,15 @@ class GlyphMixin:
                 f'Glyphs "{rest}" are not defined in draw_config.glyphs or fetchable using draw_config.glyph_urls'
             )
 
+        # parse view boxes and scrub dimensions once, so that drawing glyphs does not need to touch the SVGs
+        self.glyph_view_boxes: dict[str, tuple[float, float, float, float]] = {}
+        self.glyph_svgs: dict[str, str] = {}
         for name, svg in self.name_to_svg.items():
-            if not self._view_box_dimensions_re.match(svg):
+            view_box, scrubbed_svg = _preprocess_svg(svg)
+            if view_box is None:
                 raise ValueError(f'Glyph definition for "{name}" does not have the required "viewbox" property')
+            self.glyph_view_boxes[name] = view_box
+            self.glyph_svgs[name] = scrubbed_svg
 
     def _fetch_glyphs(self, names: Iterable[str]) -> dict[str, str]:
         names = list(names)
@@ -116,18 +120,16 @@ class GlyphMixin:
             return ""
 
         defs = "<defs>/* start glyphs */\n"
-        for name, svg in sorted(self.name_to_svg.items()):
+        for name, svg in sorted(self.glyph_svgs.items()):
             defs += f'<svg id="{name}">\n'
-            defs += self._scrub_dims_re.sub("", svg)
+            defs += svg
             defs += "\n</svg>\n"
         defs += "</defs>/* end glyphs */\n"
         return defs
 
     def get_glyph_dimensions(self, name: str, legend_type: str) -> tuple[float, float, float, float]:
         """Given a glyph name, calculate and return its width, height and y-offset for drawing."""
-        view_box = self._view_box_dimensions_re.match(self.name_to_svg[name])
-        assert view_box is not None
-        _, _, w, h = (float(v) for v in view_box.groups())
+        _, _, w, h = self.glyph_view_boxes[name]
 
         # set dimensions and offsets from center
         match legend_type:
@@ -177,7 +179,7 @@ def _fetch_svg_url(name: str, url: str, use_local_cache: bool = False) -> str:
             try:
                 sleep(0.2 * random())
                 with urlopen(url, timeout=FETCH_TIMEOUT) as f:
-                    content = f.read().decode("utf-8")
+                    content: str = f.read().decode("utf-8")
                 break
             except TimeoutError:
                 logger.warning("request timed out while trying to fetch SVG from %s", url)
@@ -190,3 +192,24 @@ def _fetch_svg_url(name: str, url: str, use_local_cache: bool = False) -> str:
         return content
     except (HTTPError, RuntimeError) as exc:
         raise RuntimeError(f'Could not fetch SVG from URL "{url}"') from exc
+
+
+@lru_cache(maxsize=128)
+def _preprocess_svg(svg: str) -> tuple[tuple[float, float, float, float] | None, str]:
+    """
+    Return the viewBox values of an SVG glyph definition (None if it doesn't have a valid one) and the definition
+    with width/height attributes scrubbed. Cached on the SVG content so that it is done once across drawers.
+    """
+    scrubbed = SCRUB_DIMS_RE.sub("", svg)
+    lowered = svg.lower()
+    if not lowered.startswith("<svg"):
+        return None, scrubbed
+    # walk viewBox attributes from the last one and use the first valid one, like the greedy regex this replaced
+    end = len(lowered)
+    while (start := lowered.rfind('viewbox="', 0, end)) != -1:
+        end = start
+        if (m := VIEW_BOX_VALUES_RE.match(svg, start + len('viewbox="'))) and lowered.find(">", m.end()) != -1:
+            x, y, w, h = (float(v) for v in m.groups())
+            if all(isfinite(v) for v in (x, y, w, h)):
+                return (x, y, w, h), scrubbed
+    return None, scrubbed
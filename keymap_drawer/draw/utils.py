@@ -2,17 +2,37 @@
 
 import re
 import string
-from html import escape
-from io import StringIO
+from functools import lru_cache
 from textwrap import TextWrapper
 from typing import Literal, Sequence
 
 from keymap_drawer.config import DrawConfig
 from keymap_drawer.draw.glyph import GlyphMixin
+from keymap_drawer.keymap import LayoutKey
 from keymap_drawer.physical_layout import Point
 
 LegendType = Literal["tap", "hold", "shifted", "left", "right"]
 
+_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+
+
+def escape(text: str) -> str:
+    """Escape text the same way as html.escape, skipping the translation if there is nothing to escape."""
+    if "&" in text or "<" in text or ">" in text or '"' in text or "'" in text:
+        return text.translate(_ESCAPE_TABLE)
+    return text
+
+
+def fmt_num(val: float) -> str:
+    """Format a number for SVG output with at most three decimals and without trailing zeros."""
+    return f"{val:.3f}".rstrip("0").rstrip(".")
+
+
+@lru_cache(maxsize=256)
+def to_class_str(classes: tuple[str, ...]) -> str:
+    """Return a class attribute string for the given classes, cached since the same combinations are used repeatedly."""
+    return (' class="' + " ".join(c for c in classes if c) + '"') if classes else ""
+
 
 class UtilsMixin(GlyphMixin):
     """Mixin that adds low-level SVG drawing methods for KeymapDrawer."""
@@ -20,7 +40,10 @@ class UtilsMixin(GlyphMixin):
     # initialized in KeymapDrawer
     cfg: DrawConfig
     layer_names: set[str]
-    out: StringIO
+    _buf: list[str]
+    _key_rect_prefix: str
+    _key_side_rect_prefix: str
+    _line_spacing_em: str
 
     @staticmethod
     def _str_to_id(val: str) -> str:
@@ -34,66 +57,32 @@ class UtilsMixin(GlyphMixin):
         allowed = string.ascii_letters + string.digits + "-_:."
         return "".join([c for c in val if c in allowed])
 
-    @staticmethod
-    def _to_class_str(classes: Sequence[str]) -> str:
-        return (' class="' + " ".join(c for c in classes if c) + '"') if classes else ""
-
-    def _split_text(self, text: str, truncate: int = 0, line_width: int = 0) -> list[str]:
+    def _split_text(self, text: str, truncate: int = 0, line_width: int = 0) -> tuple[str, ...]:
         if self.legend_is_glyph(text):
-            return [text]
-
-        # do not split on double spaces, but do split on single
-        lines = [word.replace("\x00", " ") for word in text.replace("  ", "\x00").split()]
-
-        # wrap on word boundaries if a line is too long
-        if line_width > 0 and len(lines) < truncate:
-            tw = TextWrapper(width=line_width, break_long_words=False, break_on_hyphens=False)
-
-            wrapped: list[str] = []
-            for i, line in enumerate(lines):
-                if len(line) > line_width:
-                    wrapped_line = tw._wrap_chunks(re.split(r"(?<!^.)\b", line))  # pylint: disable=protected-access
-
-                    # if we are going to exceed the max line limit, give up here and do not modify lines
-                    new_total_lines = len(wrapped) + len(wrapped_line) - 1 + len(lines) - i
-                    if (diff := new_total_lines - truncate) > 0:
-                        if diff < len(wrapped_line):  # salvage part of this line as much as we can
-                            wrapped += wrapped_line[: -diff - 1] + ["".join(wrapped_line[-diff - 1 :])]
-                        else:
-                            wrapped.append(line)
-                        wrapped += lines[i + 1 :]
-                        break
-                    wrapped += wrapped_line
-                else:
-                    wrapped.append(line)
-            lines = wrapped
-
-        # truncate number of lines if requested
-        if truncate and len(lines) > truncate:
-            lines = lines[: truncate - 1] + ["…"]
-        return lines
-
-    def _draw_rect(self, p: Point, dims: Point, radii: Point, classes: Sequence[str]) -> None:
-        self.out.write(
-            f'<rect rx="{round(radii.x)}" ry="{round(radii.y)}"'
-            f' x="{round(p.x - dims.x / 2)}" y="{round(p.y - dims.y / 2)}" '
-            f'width="{round(dims.x)}" height="{round(dims.y)}"{self._to_class_str(classes)}/>\n'
+            return (text,)
+        return _split_words(text, truncate, line_width)
+
+    def _draw_rect(self, p: Point, dims: Point, prefix: str, classes: tuple[str, ...]) -> None:
+        """Draw a rectangle, where `prefix` is a pre-formatted `<rect` opening with the corner radii."""
+        self._buf.append(
+            f'{prefix} x="{round(p.x - dims.x / 2)}" y="{round(p.y - dims.y / 2)}" '
+            f'width="{round(dims.x)}" height="{round(dims.y)}"{to_class_str(classes)}/>\n'
         )
 
-    def _draw_key(self, dims: Point, classes: Sequence[str]) -> None:
+    def _draw_key(self, dims: Point, classes: tuple[str, ...]) -> None:
         if self.cfg.draw_key_sides:
             # draw side rectangle
             self._draw_rect(
                 Point(0.0, 0.0),
                 dims,
-                Point(self.cfg.key_rx, self.cfg.key_ry),
-                classes=[*classes, "side"],
+                self._key_rect_prefix,
+                classes=(*classes, "side"),
             )
             # draw internal rectangle
             self._draw_rect(
                 Point(-self.cfg.key_side_pars.rel_x, -self.cfg.key_side_pars.rel_y),
                 dims - Point(self.cfg.key_side_pars.rel_w, self.cfg.key_side_pars.rel_h),
-                Point(self.cfg.key_side_pars.rx, self.cfg.key_side_pars.ry),
+                self._key_side_rect_prefix,
                 classes=classes,
             )
         else:
@@ -101,7 +90,7 @@ class UtilsMixin(GlyphMixin):
             self._draw_rect(
                 Point(0.0, 0.0),
                 dims,
-                Point(self.cfg.key_rx, self.cfg.key_ry),
+                self._key_rect_prefix,
                 classes=classes,
             )
 
@@ -115,46 +104,46 @@ class UtilsMixin(GlyphMixin):
             return word
         return word[: limit - 1] + "…"
 
-    def _draw_text(self, p: Point, word: str, classes: Sequence[str]) -> None:
+    def _draw_text(self, p: Point, word: str, classes: tuple[str, ...]) -> None:
         if not word:
             return
         word = self._truncate_word(word)
-        self.out.write(f'<text x="{round(p.x)}" y="{round(p.y)}"{self._to_class_str(classes)}>')
-        self.out.write(
-            f"<tspan{scale}>{escape(word)}</tspan>" if (scale := self._get_scaling(len(word))) else escape(word)
-        )
-        self.out.write("</text>\n")
+        text = f"<tspan{scale}>{escape(word)}</tspan>" if (scale := self._get_scaling(len(word))) else escape(word)
+        self._buf.append(f'<text x="{round(p.x)}" y="{round(p.y)}"{to_class_str(classes)}>{text}</text>\n')
 
-    def _draw_textblock(self, p: Point, words: Sequence[str], classes: Sequence[str], shift: float = 0) -> None:
+    def _draw_textblock(self, p: Point, words: Sequence[str], classes: tuple[str, ...], shift: float = 0) -> None:
         words = [self._truncate_word(word) for word in words]
-        self.out.write(f'<text x="{round(p.x)}" y="{round(p.y)}"{self._to_class_str(classes)}>\n')
+        x = round(p.x)
         dy_0 = (len(words) - 1) * (self.cfg.line_spacing * (1 + shift) / 2)
         scaling = self._get_scaling(max(len(w) for w in words))
-        self.out.write(f'<tspan x="{round(p.x)}" dy="-{dy_0}em"{scaling}>{escape(words[0])}</tspan>')
-        for word in words[1:]:
-            self.out.write(f'<tspan x="{round(p.x)}" dy="{self.cfg.line_spacing}em"{scaling}>{escape(word)}</tspan>')
-        self.out.write("\n</text>\n")
+        parts = [
+            f'<text x="{x}" y="{round(p.y)}"{to_class_str(classes)}>\n',
+            f'<tspan x="{x}" dy="-{fmt_num(dy_0)}em"{scaling}>{escape(words[0])}</tspan>',
+        ]
+        parts.extend(
+            f'<tspan x="{x}" dy="{self._line_spacing_em}"{scaling}>{escape(word)}</tspan>' for word in words[1:]
+        )
+        parts.append("\n</text>\n")
+        self._buf.append("".join(parts))
 
-    def _draw_glyph(self, p: Point, name: str, legend_type: LegendType, classes: Sequence[str]) -> None:
+    def _draw_glyph(self, p: Point, name: str, legend_type: LegendType, classes: tuple[str, ...]) -> None:
         width, height, d_x, d_y = self.get_glyph_dimensions(name, legend_type)
 
-        classes = [*classes, "glyph", name]
-        self.out.write(
+        classes = (*classes, "glyph", name)
+        self._buf.append(
             f'<use href="#{name}" xlink:href="#{name}" x="{round(p.x - d_x)}" y="{round(p.y - d_y)}" '
-            f'height="{height}" width="{width}"{self._to_class_str(classes)}/>\n'
+            f'height="{fmt_num(height)}" width="{fmt_num(width)}"{to_class_str(classes)}/>\n'
         )
 
     def _draw_legend(
-        self, p: Point, words: Sequence[str], classes: Sequence[str], legend_type: LegendType, shift: float = 0
+        self, p: Point, words: Sequence[str], classes: tuple[str, ...], legend_type: LegendType, shift: float = 0
     ) -> None:
         if not words:
             return
 
         is_layer = self.cfg.style_layer_activators and (layer_name := " ".join(words)) in self.layer_names
 
-        classes = [*classes, legend_type]
-        if is_layer:
-            classes.append("layer-activator")
+        classes = (*classes, legend_type, "layer-activator") if is_layer else (*classes, legend_type)
 
         if len(words) == 1:
             if glyph := self.legend_is_glyph(words[0]):
@@ -162,7 +151,7 @@ class UtilsMixin(GlyphMixin):
                 return
 
         if is_layer:
-            self.out.write(f'<a href="#{self._str_to_id(layer_name)}">\n')
+            self._buf.append(f'<a href="#{self._str_to_id(layer_name)}">\n')
 
         if len(words) == 1:
             self._draw_text(p, words[0], classes)
@@ -170,4 +159,66 @@ class UtilsMixin(GlyphMixin):
             self._draw_textblock(p, words, classes, shift)
 
         if is_layer:
-            self.out.write("</a>")
+            self._buf.append("</a>")
+
+    def _draw_legends(
+        self,
+        p_tap: Point,
+        p_mid: Point,
+        offsets: Point,
+        l_key: LayoutKey,
+        tap_words: Sequence[str],
+        classes: tuple[str, ...],
+        shift: float = 0,
+    ) -> None:
+        """
+        Draw all legends of a key, with the tap legend at p_tap and the others offset from p_mid by `offsets`
+        in their respective directions. Empty legends are skipped without going through _draw_legend.
+        """
+        self._draw_legend(p_tap, tap_words, classes, "tap", shift)
+        if l_key.hold:
+            self._draw_legend(Point(p_mid.x, p_mid.y + offsets.y), (l_key.hold,), classes, "hold")
+        if l_key.shifted:
+            self._draw_legend(Point(p_mid.x, p_mid.y - offsets.y), (l_key.shifted,), classes, "shifted")
+        if l_key.left:
+            self._draw_legend(Point(p_mid.x - offsets.x, p_mid.y), (l_key.left,), classes, "left")
+        if l_key.right:
+            self._draw_legend(Point(p_mid.x + offsets.x, p_mid.y), (l_key.right,), classes, "right")
+
+
+@lru_cache(maxsize=1024)
+def _split_words(text: str, truncate: int, line_width: int) -> tuple[str, ...]:
+    """
+    Split a legend into lines on single spaces, wrapping long lines to `line_width` and truncating to `truncate` lines.
+    Cached since the same legends tend to repeat across keys and layers.
+    """
+    # do not split on double spaces, but do split on single
+    lines = [word.replace("\x00", " ") for word in text.replace("  ", "\x00").split()]
+
+    # wrap on word boundaries if a line is too long
+    if line_width > 0 and len(lines) < truncate:
+        tw = TextWrapper(width=line_width, break_long_words=False, break_on_hyphens=False)
+
+        wrapped: list[str] = []
+        for i, line in enumerate(lines):
+            if len(line) > line_width:
+                wrapped_line = tw._wrap_chunks(re.split(r"(?<!^.)\b", line))  # pylint: disable=protected-access
+
+                # if we are going to exceed the max line limit, give up here and do not modify lines
+                new_total_lines = len(wrapped) + len(wrapped_line) - 1 + len(lines) - i
+                if (diff := new_total_lines - truncate) > 0:
+                    if diff < len(wrapped_line):  # salvage part of this line as much as we can
+                        wrapped += wrapped_line[: -diff - 1] + ["".join(wrapped_line[-diff - 1 :])]
+                    else:
+                        wrapped.append(line)
+                    wrapped += lines[i + 1 :]
+                    break
+                wrapped += wrapped_line
+            else:
+                wrapped.append(line)
+        lines = wrapped
+
+    # truncate number of lines if requested
+    if truncate and len(lines) > truncate:
+        lines = lines[: truncate - 1] + ["…"]
+    return tuple(lines)
@@ -147,7 +147,10 @@ class PhysicalKey:
 
 
 class PhysicalLayout(BaseModel):
-    """Represents the physical layout of keys on the keyboard, as a sequence of keys."""
+    """
+    Represents the physical layout of keys on the keyboard, as a sequence of keys.
+    Derived dimensions are cached on first access, so `keys` should not be mutated afterwards.
+    """
 
     keys: list[PhysicalKey]
 
@@ -174,11 +177,21 @@ class PhysicalLayout(BaseModel):
         """Return minimum key height in the layout."""
         return min(k.height for k in self.keys)
 
+    @cached_property
+    def key_bounds(self) -> list[tuple[float, float, float, float]]:
+        """Return left, top, right and bottom coordinates of each key, ignoring rotation."""
+        return [
+            (k.pos.x - k.width / 2, k.pos.y - k.height / 2, k.pos.x + k.width / 2, k.pos.y + k.height / 2)
+            for k in self.keys
+        ]
+
+    # keys derived from an existing layout are already valid, so the operations below skip validation
+
     def __add__(self, other: Point) -> "PhysicalLayout":
-        return PhysicalLayout(keys=[k + other for k in self.keys])
+        return PhysicalLayout.model_construct(keys=[k + other for k in self.keys])
 
     def __rmul__(self, other: int | float) -> "PhysicalLayout":
-        return PhysicalLayout(keys=[other * k for k in self.keys])
+        return PhysicalLayout.model_construct(keys=[other * k for k in self.keys])
 
     def normalize(self) -> "PhysicalLayout":
         """Normalize the layout so that the keys are all in (0, 0) to (width, height) coordinates."""
@@ -186,7 +199,7 @@ class PhysicalLayout(BaseModel):
             min(k.pos.x - k.bounding_width / 2 for k in self.keys),
             min(k.pos.y - k.bounding_height / 2 for k in self.keys),
         )
-        return PhysicalLayout(keys=[k - min_pt for k in self.keys])
+        return PhysicalLayout.model_construct(keys=[k - min_pt for k in self.keys])
 
 
 class PhysicalLayoutGenerator(BaseModel, arbitrary_types_allowed=True):